@@ -1,13 +1,27 @@
 #!/usr/bin/env python3
 import os
 import sys
-import urllib.request
 import gzip
+import hashlib
+import logging
 import shutil
+import socket
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+log = logging.getLogger("bench")
 
 INPUT_DIR = "inputs/benchmarks"
 OUTPUT_DIR = "output"
 
+# Copy/IO buffer for streaming downloads to disk
+DOWNLOAD_BUFFER_SIZE = 128 * 1024
+
+# .gz payloads at least this large are inflated by pigz/gzip instead of the gzip module
+NATIVE_GUNZIP_MIN_SIZE = 4 * 1024 * 1024
+
 # GitHub mirror for the raw ISPD98/ICCAD04 benchmark files
 IBM_GITHUB_BASE = "https://raw.githubusercontent.com/ckmarkoh/101_2_pdpa2/master/benchmark/ibm01"
 
@@ -26,55 +40,191 @@ DESIGNS = {
         "url": IBM_GITHUB_BASE,
         "config_file": "config_ibm01.toml",
         "description": "Classic ISPD98 Mixed-Size Benchmark (~12k cells)",
-        "is_bookshelf": True
+        "is_bookshelf": True,
+        # Hook only: {local file name: sha256 hex digest}. Nothing is pinned, so hash
+        # verification has no effect for any design until digests are added here.
+        "sha256": {}
     }
 }
 
+# Shared session so repeated downloads from the same host reuse one TLS connection.
+# Built on first use so directory setup works without `requests` installed.
+_session = None
+_session_lock = threading.Lock()
+
+def get_session():
+    global _session
+    with _session_lock:
+        if _session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            from urllib3.connection import HTTPConnection
+
+            class TunedHTTPAdapter(HTTPAdapter):
+                # urllib3's defaults already disable Nagle (TCP_NODELAY); add a 1 MiB receive buffer
+                SOCKET_OPTIONS = HTTPConnection.default_socket_options + [
+                    (socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20),
+                ]
+
+                def init_poolmanager(self, *args, **kwargs):
+                    kwargs["socket_options"] = self.SOCKET_OPTIONS
+                    super().init_poolmanager(*args, **kwargs)
+
+            session = requests.Session()
+            session.mount("https://", TunedHTTPAdapter(pool_maxsize=8, max_retries=3))
+            session.headers.update({"User-Agent": "Mozilla/5.0", "Accept-Encoding": "gzip"})
+            _session = session
+        return _session
+
+def make_dir(path):
+    # Attempt the mkdir directly; an existing directory is not an error
+    try:
+        os.makedirs(path)
+    except FileExistsError:
+        return False
+    return True
+
 def setup_directories():
     for d in [INPUT_DIR, OUTPUT_DIR]:
-        if not os.path.exists(d):
-            os.makedirs(d)
-            print(f"[INFO] Created directory: {d}")
-
-def download_file(url, filepath):
-    if os.path.exists(filepath):
-        if os.path.getsize(filepath) < 1000:
-            print(f" {filepath} looks invalid (too small). Deleting.")
-            os.remove(filepath)
+        if make_dir(d):
+            log.info("Created directory: %s", d)
+
+def file_size(path):
+    # Single stat() instead of separate exists()/getsize() calls
+    try:
+        return os.stat(path).st_size
+    except FileNotFoundError:
+        return None
+
+def decompress_stream(source, out_file, size=None):
+    # For large payloads prefer the native (and for pigz, multi-threaded) inflaters;
+    # small or unknown-size ones are not worth a process spawn
+    if size is not None and size >= NATIVE_GUNZIP_MIN_SIZE:
+        for tool in (["pigz", "-dc"], ["gzip", "-dc"]):
+            if shutil.which(tool[0]):
+                # stderr goes to a file so a chatty tool can't fill a pipe and stall the copy
+                with tempfile.TemporaryFile() as err_file:
+                    proc = subprocess.Popen(
+                        tool, stdin=subprocess.PIPE, stdout=out_file, stderr=err_file
+                    )
+                    try:
+                        shutil.copyfileobj(source, proc.stdin, DOWNLOAD_BUFFER_SIZE)
+                    except BrokenPipeError:
+                        # The tool exited early; its exit status and stderr say why
+                        pass
+                    finally:
+                        try:
+                            proc.stdin.close()
+                        except BrokenPipeError:
+                            pass
+                        returncode = proc.wait()
+                    err_file.seek(0)
+                    stderr = err_file.read()
+                if returncode != 0:
+                    log.error("%s", stderr.decode(errors="replace").strip())
+                    raise subprocess.CalledProcessError(returncode, tool, stderr=stderr)
+                return
+
+    with gzip.GzipFile(fileobj=source) as f_in:
+        shutil.copyfileobj(f_in, out_file, DOWNLOAD_BUFFER_SIZE)
+
+def sha256_matches(filepath, expected):
+    with open(filepath, "rb") as f:
+        if hasattr(hashlib, "file_digest"):
+            digest = hashlib.file_digest(f, "sha256").hexdigest()
+        else:
+            # hashlib.file_digest is Python 3.11+
+            h = hashlib.sha256()
+            for chunk in iter(lambda: f.read(DOWNLOAD_BUFFER_SIZE), b""):
+                h.update(chunk)
+            digest = h.hexdigest()
+    return digest == expected.lower()
+
+def read_etag(filepath):
+    try:
+        # requests decodes header values as latin-1, so store them the same way
+        with open(filepath + ".etag", encoding="latin-1") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+def download_file(url, filepath, sha256=None):
+    # Plain .gz payloads are inflated on the fly, so only the extracted file touches disk
+    decompress = url.endswith(".gz") and not url.endswith(".tar.gz") and filepath.endswith(".gz")
+    out_path = filepath[:-3] if decompress else filepath
+
+    # A pinned hash is authoritative: a match needs no round trip and a mismatch
+    # forces an unconditional download. Otherwise files fetched with an ETag are
+    # revalidated and anything else is trusted as-is.
+    headers = {}
+    size = file_size(out_path)
+    if size is not None:
+        if sha256:
+            if sha256_matches(out_path, sha256):
+                log.info("Found %s (sha256 verified)", os.path.basename(out_path))
+                return
+            # Keep the current copy until a verified download replaces it
+            log.warning("%s does not match its pinned sha256. Re-downloading.", out_path)
+        elif size < 1000:
+            log.warning("%s looks invalid (too small). Deleting.", out_path)
+            os.remove(out_path)
         else:
-            print(f"[INFO] Found {os.path.basename(filepath)}")
-            return
+            etag = read_etag(out_path)
+            if etag is None:
+                log.info("Found %s", os.path.basename(out_path))
+                return
+            headers["If-None-Match"] = etag
 
-    print(f"[INFO] Downloading {url}...")
+    # Stream into a side file and rename on success so interrupted runs never leave a truncated out_path
+    part_path = out_path + ".part"
+    if headers:
+        log.info("Revalidating %s...", url)
     try:
-        req = urllib.request.Request(
-            url, 
-            data=None, 
-            headers={'User-Agent': 'Mozilla/5.0'}
-        )
-        with urllib.request.urlopen(req) as response, open(filepath, 'wb') as out_file:
-            shutil.copyfileobj(response, out_file)
-
-        if url.endswith(".gz") and not url.endswith(".tar.gz") and not filepath.endswith(".tar.gz"):
-            if filepath.endswith(".gz"):
-                print(f"[INFO] Decompressing {filepath}...")
-                with gzip.open(filepath, 'rb') as f_in:
-                    with open(filepath[:-3], 'wb') as f_out: 
-                        shutil.copyfileobj(f_in, f_out)
-                os.remove(filepath)
-                print(f"[INFO] Extracted to {filepath[:-3]}")
+        with get_session().get(url, headers=headers, stream=True, timeout=30) as response:
+            if response.status_code == 304:
+                log.info("%s is up to date", os.path.basename(out_path))
+                return
+            response.raise_for_status()
+            log.info("Downloading %s...", url)
+            response.raw.decode_content = True
+            # A .gz served with Content-Encoding: gzip is already inflated by urllib3
+            encoding = response.headers.get("Content-Encoding", "").lower()
+            with open(part_path, 'wb', buffering=DOWNLOAD_BUFFER_SIZE) as out_file:
+                if decompress and encoding not in ("gzip", "x-gzip"):
+                    log.info("Decompressing %s...", filepath)
+                    # No transport encoding here, so Content-Length is the .gz size
+                    length = response.headers.get("Content-Length")
+                    decompress_stream(response.raw, out_file, int(length) if length else None)
+                else:
+                    shutil.copyfileobj(response.raw, out_file, DOWNLOAD_BUFFER_SIZE)
+            etag = response.headers.get("ETag")
+        if sha256 and not sha256_matches(part_path, sha256):
+            raise ValueError(f"downloaded file does not match pinned sha256 {sha256}")
+        os.replace(part_path, out_path)
+
+        if etag:
+            with open(out_path + ".etag", "w", encoding="latin-1") as f:
+                f.write(etag + "\n")
+        else:
+            try:
+                os.remove(out_path + ".etag")
+            except FileNotFoundError:
+                pass
+
+        if decompress:
+            log.info("Extracted to %s", out_path)
 
     except Exception as e:
-        print(f" Failed to download {url}")
-        print(f"        Error: {e}")
-        if os.path.exists(filepath):
-            os.remove(filepath)
+        log.error("Failed to download %s: %s", url, e)
+        try:
+            os.remove(part_path)
+        except FileNotFoundError:
+            pass
 
 def process_ibm01(data):
     extract_dir = os.path.join(INPUT_DIR, "ibm01_raw")
-    if not os.path.exists(extract_dir):
-        os.makedirs(extract_dir)
-        print(f"[INFO] Created {extract_dir}")
+    if make_dir(extract_dir):
+        log.info("Created %s", extract_dir)
 
     files_to_download = {
         "ibm01.nodes": "ibm01.nodes",
@@ -83,30 +233,37 @@ def process_ibm01(data):
         "ibm01-cu85.scl": "ibm01.scl"
     }
 
-    print("[INFO] Downloading IBM01 files from GitHub mirror...")
-    all_files_present = True
-    for remote_name, local_name in files_to_download.items():
+    log.info("Downloading IBM01 files from GitHub mirror...")
+    def fetch(item):
+        remote_name, local_name = item
         url = f"{data['url']}/{remote_name}"
         local_path = os.path.join(extract_dir, local_name)
-        if not os.path.exists(local_path):
-            download_file(url, local_path)
-        if not os.path.exists(local_path):
-            all_files_present = False
+        download_file(url, local_path, data.get("sha256", {}).get(local_name))
+        return file_size(local_path) is not None
+
+    # Downloads are independent and latency-bound, so fetch them concurrently
+    with ThreadPoolExecutor(max_workers=len(files_to_download)) as executor:
+        all_files_present = all(list(executor.map(fetch, files_to_download.items())))
 
     if not all_files_present:
-        print("[ERROR] Failed to download all required IBM01 files.")
+        log.error("Failed to download all required IBM01 files.")
         return
 
     # Generate AUX file
     aux_path = os.path.join(extract_dir, "ibm01.aux")
-    if not os.path.exists(aux_path):
-        print("[INFO] Generating ibm01.aux...")
-        with open(aux_path, "w") as f:
-            f.write("RowBasedPlacement : ibm01.nodes ibm01.nets ibm01.pl ibm01.scl\n")
-
-    output_def_path = os.path.join(OUTPUT_DIR, "ibm01_placed.def")
+    try:
+        fd = os.open(aux_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+    except FileExistsError:
+        pass
+    else:
+        log.info("Generating ibm01.aux...")
+        try:
+            os.write(fd, b"RowBasedPlacement : ibm01.nodes ibm01.nets ibm01.pl ibm01.scl\n")
+        finally:
+            os.close(fd)
 
 def main():
+    logging.basicConfig(level=logging.INFO, format="[%(levelname)s] %(message)s")
     setup_directories()
 
     print("\n Benchmark setup complete.")
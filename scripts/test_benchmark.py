@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+import gzip
+import http.server
+import importlib.util
+import io
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import unittest
+
+import benchmark
+
+HAS_REQUESTS = importlib.util.find_spec("requests") is not None
+HAS_NATIVE_GUNZIP = bool(shutil.which("pigz") or shutil.which("gzip"))
+
+PAYLOAD = b"RowBasedPlacement : ibm01.nodes ibm01.nets ibm01.pl ibm01.scl\n" * 100
+
+class PayloadHandler(http.server.BaseHTTPRequestHandler):
+    # Each test sets the body and extra headers served for every GET
+    body = b""
+    headers_out = {}
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(self.body)))
+        for name, value in self.headers_out.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def log_message(self, *args):
+        pass
+
+@unittest.skipUnless(HAS_NATIVE_GUNZIP, "neither pigz nor gzip is on PATH")
+class DecompressStreamTest(unittest.TestCase):
+    def decompress(self, data, size):
+        with tempfile.TemporaryFile() as out_file:
+            benchmark.decompress_stream(io.BytesIO(data), out_file, size)
+            out_file.seek(0)
+            return out_file.read()
+
+    def test_large_payload_is_inflated_by_native_tool(self):
+        size = benchmark.NATIVE_GUNZIP_MIN_SIZE
+        self.assertEqual(self.decompress(gzip.compress(PAYLOAD), size), PAYLOAD)
+
+    def test_native_tool_failure_reports_stderr(self):
+        with self.assertLogs("bench", "ERROR"):
+            with self.assertRaises(subprocess.CalledProcessError) as ctx:
+                self.decompress(b"not gzip" * 1000, benchmark.NATIVE_GUNZIP_MIN_SIZE)
+        self.assertTrue(ctx.exception.stderr)
+
+    def test_small_payload_uses_gzip_module(self):
+        with self.assertRaises(gzip.BadGzipFile):
+            self.decompress(b"not gzip" * 1000, 8000)
+
+@unittest.skipUnless(HAS_REQUESTS, "requests is not installed")
+class DownloadFileTest(unittest.TestCase):
+    def setUp(self):
+        self.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), PayloadHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base_url = f"http://127.0.0.1:{self.server.server_port}"
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.tmp.cleanup()
+
+    def download_gz(self, headers):
+        PayloadHandler.body = gzip.compress(PAYLOAD)
+        PayloadHandler.headers_out = headers
+        benchmark.download_file(f"{self.base_url}/ibm01.aux.gz", os.path.join(self.tmp.name, "ibm01.aux.gz"))
+        with open(os.path.join(self.tmp.name, "ibm01.aux"), "rb") as f:
+            return f.read()
+
+    def test_gz_payload_is_inflated(self):
+        self.assertEqual(self.download_gz({}), PAYLOAD)
+
+    def test_gz_payload_with_gzip_content_encoding_is_inflated_once(self):
+        self.assertEqual(self.download_gz({"Content-Encoding": "gzip"}), PAYLOAD)
+
+if __name__ == "__main__":
+    unittest.main()